@@ -3,8 +3,17 @@ import pygame
 import sys
 import random
 import math
+import queue
+import threading
+import time
+import numpy as np
 from simulation import Simulation
 
+try:
+    import moderngl
+except ImportError: # moderngl is optional; without it everything is drawn with SDL blits
+    moderngl = None
+
 #======================================
 # VISUALIZATION SETTINGS
 #======================================
@@ -22,70 +31,276 @@ HOUSEHOLD_GRID_START_Y = 250
 AGENT_RADIUS = 5
 PARTICLE_RADIUS = 2
 PARTICLE_SPEED = 4
+PARTICLE_POOL_CAPACITY = 4096 # Initial size; the pool grows as needed
+
+# --- Timing ---
+FPS = 60
+SIM_HZ = 30                      # Simulation ticks per second, independent of FPS
+MAX_FRAME_TIME = 0.25            # Seconds of sim time one frame may catch up on
+SIM_IN_BACKGROUND_THREAD = False # Run ticks on a worker thread instead of in the render loop
+WARMUP_TICKS = 0                 # Ticks to run headless before the first frame
+
+# --- Rendering ---
+USE_OPENGL = False # Draw on the GPU with moderngl (if installed) instead of SDL blits
 
 #======================================
-# PARTICLE CLASS for Animation
+# PARTICLE POOL for Animation
 #======================================
-class Particle:
-    """Represents an animated particle for visualizing flows."""
-    def __init__(self, start_pos, end_pos):
-        self.start_pos = pygame.math.Vector2(start_pos)
-        self.end_pos = pygame.math.Vector2(end_pos)
-        self.current_pos = self.start_pos
-        self.distance_to_travel = (self.end_pos - self.start_pos).length()
-        
-        if self.distance_to_travel > 0:
-            self.direction = (self.end_pos - self.start_pos).normalize()
-        else:
-            self.direction = pygame.math.Vector2(0, 0)
-        
-        self.finished = False
+class ParticlePool:
+    """
+    Holds all animated particles used for visualizing flows.
+    Particle state is stored as parallel arrays; only the first n slots are live.
+    """
+    def __init__(self, capacity=PARTICLE_POOL_CAPACITY):
+        self.px = np.zeros(capacity, dtype=np.float32)
+        self.py = np.zeros(capacity, dtype=np.float32)
+        self.step_x = np.zeros(capacity, dtype=np.float32) # Pixels moved per frame
+        self.step_y = np.zeros(capacity, dtype=np.float32)
+        self.frames_left = np.zeros(capacity, dtype=np.int32) # Frames until arrival
+        # Per-frame scratch space, reused so update() and draw() don't allocate
+        self._finished = np.zeros(capacity, dtype=np.bool_)
+        self._draw_x = np.zeros(capacity, dtype=np.int32)
+        self._draw_y = np.zeros(capacity, dtype=np.int32)
+        self.n = 0
+        self.sprite = make_dot_sprite(COLOR_MONEY, PARTICLE_RADIUS)
+
+    def _columns(self):
+        return (self.px, self.py, self.step_x, self.step_y, self.frames_left)
+
+    def _grow(self, min_capacity):
+        """Doubles the pool capacity until it fits min_capacity, keeping all live particles."""
+        capacity = len(self.px)
+        while capacity < min_capacity:
+            capacity *= 2
+        for name in ('px', 'py', 'step_x', 'step_y', 'frames_left', '_finished', '_draw_x', '_draw_y'):
+            old = getattr(self, name)
+            col = np.zeros(capacity, dtype=old.dtype)
+            col[:self.n] = old[:self.n]
+            setattr(self, name, col)
+
+    def add_batch(self, start_xy, end_xy):
+        """
+        Spawns one particle per row of the (k, 2) arrays start_xy and end_xy,
+        each travelling from its start point to its end point.
+        """
+        k = len(start_xy)
+        n = self.n
+        if n + k > len(self.px):
+            self._grow(n + k)
+
+        delta = end_xy - start_xy
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        scale = np.divide(PARTICLE_SPEED, distance, out=np.zeros_like(distance), where=distance > 0)
+
+        self.px[n:n + k] = start_xy[:, 0]
+        self.py[n:n + k] = start_xy[:, 1]
+        # Each particle's per-frame step is fixed, so it is computed only once
+        np.multiply(delta[:, 0], scale, out=self.step_x[n:n + k])
+        np.multiply(delta[:, 1], scale, out=self.step_y[n:n + k])
+        # A particle has arrived once it has moved at least its full distance
+        self.frames_left[n:n + k] = np.ceil(distance / PARTICLE_SPEED)
+        self.n = n + k
 
     def update(self):
-        """Moves the particle closer to its destination."""
-        if not self.finished:
-            self.current_pos += self.direction * PARTICLE_SPEED
-            # Check if particle has reached or passed the destination
-            if (self.current_pos - self.start_pos).length() >= self.distance_to_travel:
-                self.finished = True
+        """Moves all particles closer to their destinations and drops finished ones."""
+        n = self.n
+        self.px[:n] += self.step_x[:n]
+        self.py[:n] += self.step_y[:n]
+        self.frames_left[:n] -= 1
+
+        # Swap-remove finished particles: the holes they leave in the live
+        # prefix are filled with survivors from the tail, so the work done is
+        # proportional to the number of particles that finished.
+        frames_left = self.frames_left[:n]
+        finished = np.less_equal(frames_left, 0, out=self._finished[:n])
+        if finished.any():
+            dead = np.flatnonzero(finished)
+            k = n - len(dead)
+            holes = dead[dead < k]
+            survivors = k + np.flatnonzero(frames_left[k:] > 0)
+            for col in self._columns():
+                col[holes] = col[survivors]
+            self.n = k
 
     def draw(self, surface):
-        """Draws the particle on the screen."""
-        if not self.finished:
-            pygame.draw.circle(surface, COLOR_MONEY, (int(self.current_pos.x), int(self.current_pos.y)), PARTICLE_RADIUS)
+        """Draws all live particles on the screen in a single batched blit."""
+        n = self.n
+        xs = self._draw_x[:n]
+        ys = self._draw_y[:n]
+        np.copyto(xs, self.px[:n], casting='unsafe')
+        np.copyto(ys, self.py[:n], casting='unsafe')
+        xs -= PARTICLE_RADIUS
+        ys -= PARTICLE_RADIUS
+        xs, ys = xs.tolist(), ys.tolist()
+        sprite = self.sprite
+        surface.blits([(sprite, (x, y)) for x, y in zip(xs, ys)], doreturn=0)
+
+#======================================
+# OPENGL RENDERER
+#======================================
+BACKGROUND_VERTEX_SHADER = """
+#version 330
+in vec2 in_vert;
+out vec2 uv;
+void main() {
+    uv = in_vert * 0.5 + 0.5;
+    gl_Position = vec4(in_vert, 0.0, 1.0);
+}
+"""
+
+BACKGROUND_FRAGMENT_SHADER = """
+#version 330
+uniform sampler2D background;
+in vec2 uv;
+out vec4 color;
+void main() {
+    color = texture(background, uv);
+}
+"""
+
+PARTICLE_VERTEX_SHADER = """
+#version 330
+uniform vec2 screen_size;
+uniform float point_size;
+in float in_x;
+in float in_y;
+void main() {
+    // Truncate to whole pixels and centre the point on the pixel corner,
+    // matching where the SDL path places its dot sprite
+    vec2 ndc = floor(vec2(in_x, in_y)) / screen_size * 2.0 - 1.0;
+    gl_Position = vec4(ndc.x, -ndc.y, 0.0, 1.0);
+    gl_PointSize = point_size;
+}
+"""
+
+PARTICLE_FRAGMENT_SHADER = """
+#version 330
+uniform vec3 particle_color;
+uniform float radius;
+out vec4 color;
+void main() {
+    // Discard fragments outside the circle to get round points
+    vec2 offset = (gl_PointCoord - 0.5) * 2.0 * radius;
+    if (dot(offset, offset) > radius * radius) {
+        discard;
+    }
+    color = vec4(particle_color, 1.0);
+}
+"""
+
+class GLRenderer:
+    """
+    Draws the cached background and all particles with OpenGL.
+    Particles are rendered as point sprites in a single draw call, with
+    positions streamed from the ParticlePool arrays every frame.
+    """
+    def __init__(self, background, ctx=None):
+        self.ctx = ctx if ctx is not None else moderngl.create_context()
+        self.ctx.enable(moderngl.PROGRAM_POINT_SIZE)
+
+        # Background: one full-screen textured quad
+        width, height = background.get_size()
+        self.background_texture = self.ctx.texture(
+            (width, height), 3, pygame.image.tobytes(background, 'RGB', True))
+        background_program = self.ctx.program(
+            vertex_shader=BACKGROUND_VERTEX_SHADER, fragment_shader=BACKGROUND_FRAGMENT_SHADER)
+        quad = np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype=np.float32)
+        self.background_vao = self.ctx.vertex_array(
+            background_program, [(self.ctx.buffer(quad.tobytes()), '2f', 'in_vert')])
+
+        # Particles: x and y are uploaded straight from the pool's columns
+        self.particle_program = self.ctx.program(
+            vertex_shader=PARTICLE_VERTEX_SHADER, fragment_shader=PARTICLE_FRAGMENT_SHADER)
+        self.particle_program['screen_size'].value = (width, height)
+        self.particle_program['point_size'].value = 2 * PARTICLE_RADIUS
+        self.particle_program['radius'].value = PARTICLE_RADIUS
+        self.particle_program['particle_color'].value = tuple(c / 255 for c in COLOR_MONEY)
+        self.capacity = PARTICLE_POOL_CAPACITY
+        self.x_buffer = self.ctx.buffer(reserve=4 * self.capacity, dynamic=True)
+        self.y_buffer = self.ctx.buffer(reserve=4 * self.capacity, dynamic=True)
+        self.particle_vao = self.ctx.vertex_array(
+            self.particle_program, [(self.x_buffer, 'f', 'in_x'), (self.y_buffer, 'f', 'in_y')])
+
+    def draw(self, particles):
+        """Draws the background and all live particles into the current framebuffer."""
+        self.background_texture.use(0)
+        self.background_vao.render(moderngl.TRIANGLE_STRIP)
+
+        n = particles.n
+        if n == 0:
+            return
+        if n > self.capacity:
+            while self.capacity < n:
+                self.capacity *= 2
+            self.x_buffer.orphan(4 * self.capacity)
+            self.y_buffer.orphan(4 * self.capacity)
+        self.x_buffer.write(particles.px[:n])
+        self.y_buffer.write(particles.py[:n])
+        self.particle_vao.render(moderngl.POINTS, vertices=n)
 
 #======================================
 # HELPER FUNCTIONS
 #======================================
+def make_dot_sprite(color, radius):
+    """Pre-renders a filled circle onto a small transparent surface."""
+    sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+    pygame.draw.circle(sprite, color, (radius, radius), radius)
+    return sprite
+
 def calculate_agent_positions(sim):
-    """Calculates the screen positions for all firms and households."""
-    firm_positions = {}
-    hh_positions = {}
+    """
+    Calculates the screen positions for all firms and households.
+    Returns two (N, 2) float32 arrays indexed by agent ID.
+    """
     x_padding = 50
 
     # Calculate firm positions (in a line)
     num_firms = len(sim.firms)
     firm_spacing = (SCREEN_WIDTH - 2 * x_padding) / (num_firms - 1) if num_firms > 1 else 0
-    for i, firm_id in enumerate(sim.firms.keys()):
-        x = x_padding + i * firm_spacing
-        firm_positions[firm_id] = (x, FIRM_Y_POSITION)
+    firm_positions = np.empty((num_firms, 2), dtype=np.float32)
+    firm_positions[:, 0] = x_padding + np.arange(num_firms) * firm_spacing
+    firm_positions[:, 1] = FIRM_Y_POSITION
 
     # Calculate household positions (in a grid)
     num_households = len(sim.households)
     agents_per_row = int((SCREEN_WIDTH - 2 * x_padding) / (AGENT_RADIUS * 4))
-    for i, hh_id in enumerate(sim.households.keys()):
-        row = i // agents_per_row
-        col = i % agents_per_row
-        x = x_padding + col * (AGENT_RADIUS * 4)
-        y = HOUSEHOLD_GRID_START_Y + row * (AGENT_RADIUS * 4)
-        hh_positions[hh_id] = (x, y)
-        
+    row, col = np.divmod(np.arange(num_households), agents_per_row)
+    hh_positions = np.empty((num_households, 2), dtype=np.float32)
+    hh_positions[:, 0] = x_padding + col * (AGENT_RADIUS * 4)
+    hh_positions[:, 1] = HOUSEHOLD_GRID_START_Y + row * (AGENT_RADIUS * 4)
+
     return firm_positions, hh_positions
 
-def draw_agents(surface, agent_positions, color):
-    """Draws agents based on their pre-calculated positions."""
-    for pos in agent_positions.values():
-        pygame.draw.circle(surface, color, (int(pos[0]), int(pos[1])), AGENT_RADIUS)
+def draw_agents(surface, agent_positions, sprite):
+    """Draws agents based on their pre-calculated positions in a single batched blit."""
+    corners = (agent_positions.astype(np.int32) - AGENT_RADIUS).tolist()
+    surface.blits([(sprite, corner) for corner in corners], doreturn=0)
+
+def render_background(firm_positions, household_positions):
+    """Pre-renders the background and all static agents onto one surface."""
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    background.fill(COLOR_BACKGROUND)
+    draw_agents(background, firm_positions, make_dot_sprite(COLOR_FIRM, AGENT_RADIUS))
+    draw_agents(background, household_positions, make_dot_sprite(COLOR_HOUSEHOLD, AGENT_RADIUS))
+    return background
+
+def run_simulation_thread(sim, tick_queue, stop_event):
+    """
+    Runs simulation ticks at SIM_HZ on a background thread, handing each
+    tick's transactions to the render loop through tick_queue.
+    """
+    sim_step = 1.0 / SIM_HZ
+    next_tick = time.perf_counter()
+    while not stop_event.is_set():
+        # The tick's arrays are reused by the next tick, so hand over copies
+        from_ids, to_ids, amounts = sim.run_one_tick()
+        tick_queue.put((from_ids.copy(), to_ids.copy(), amounts.copy())) # Blocks if the renderer falls behind
+        next_tick += sim_step
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_tick = time.perf_counter() # Running late; don't try to catch up
 
 #======================================
 # MAIN APPLICATION
@@ -93,18 +308,44 @@ def draw_agents(surface, agent_positions, color):
 def main():
     # --- Initialization ---
     pygame.init()
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    use_opengl = USE_OPENGL and moderngl is not None
+    display_flags = pygame.OPENGL | pygame.DOUBLEBUF if use_opengl else 0
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), display_flags)
     pygame.display.set_caption("Agent-Based Economy Simulation")
     clock = pygame.time.Clock()
     
     with open('config.json', 'r') as f:
         config = json.load(f)
-    sim = Simulation(config)
+    # Warm-up ticks are never drawn, so they skip recording transactions
+    sim = Simulation(config, record_transactions=False)
+    for _ in range(WARMUP_TICKS):
+        sim.run_one_tick()
+    sim.record_transactions = True
 
     # Calculate static agent positions once
     firm_positions, household_positions = calculate_agent_positions(sim)
     
-    active_particles = []
+    # Agents never move, so draw them once onto a cached background
+    background = render_background(firm_positions, household_positions)
+    if use_opengl:
+        renderer = GLRenderer(background)
+    else:
+        background = background.convert()
+    particles = ParticlePool()
+
+    if SIM_IN_BACKGROUND_THREAD:
+        # Run the first tick here so that Numba's parallel runtime starts on
+        # the main thread; starting it from the worker can hang at exit
+        from_ids, to_ids, amounts = sim.run_one_tick()
+        particles.add_batch(household_positions[from_ids], firm_positions[to_ids])
+
+        tick_queue = queue.Queue(maxsize=2)
+        stop_event = threading.Event()
+        sim_thread = threading.Thread(target=run_simulation_thread, args=(sim, tick_queue, stop_event), daemon=True)
+        sim_thread.start()
+    sim_step = 1.0 / SIM_HZ
+    accumulator = 0.0
+    dt = 0.0
 
     # --- MAIN LOOP ---
     running = True
@@ -115,35 +356,41 @@ def main():
                 running = False
 
         # --- Simulation Step ---
-        # Run one tick and get the list of financial transactions
-        transactions = sim.run_one_tick()
-        
-        # Create new particles for each transaction
-        for trans in transactions:
-            start_pos = household_positions.get(trans['from_id'])
-            end_pos = firm_positions.get(trans['to_id'])
-            if start_pos and end_pos:
-                active_particles.append(Particle(start_pos, end_pos))
+        # Collect the ticks due since the last frame and create new particles
+        # for each of their financial transactions
+        if SIM_IN_BACKGROUND_THREAD:
+            while True:
+                try:
+                    from_ids, to_ids, amounts = tick_queue.get_nowait()
+                except queue.Empty:
+                    break
+                particles.add_batch(household_positions[from_ids], firm_positions[to_ids])
+        else:
+            accumulator = min(accumulator + dt, MAX_FRAME_TIME)
+            while accumulator >= sim_step:
+                from_ids, to_ids, amounts = sim.run_one_tick()
+                particles.add_batch(household_positions[from_ids], firm_positions[to_ids])
+                accumulator -= sim_step
 
         # --- Update and Draw ---
-        screen.fill(COLOR_BACKGROUND)
-        
-        # Draw static agents
-        draw_agents(screen, firm_positions, COLOR_FIRM)
-        draw_agents(screen, household_positions, COLOR_HOUSEHOLD)
-        
-        # Update and draw all active particles
-        for particle in active_particles:
-            particle.update()
-            particle.draw(screen)
-            
-        # Remove particles that have finished their journey
-        active_particles = [p for p in active_particles if not p.finished]
+        particles.update()
+        if use_opengl:
+            renderer.draw(particles)
+        else:
+            # Clear the screen and draw static agents, then all active particles
+            screen.blit(background, (0, 0))
+            particles.draw(screen)
         
         pygame.display.flip()
-        clock.tick(60)
+        dt = clock.tick(FPS) / 1000.0
 
     # --- Shutdown ---
+    if SIM_IN_BACKGROUND_THREAD:
+        # Free up the queue so a blocked put() returns and the thread can exit
+        stop_event.set()
+        while not tick_queue.empty():
+            tick_queue.get_nowait()
+        sim_thread.join()
     pygame.quit()
     sys.exit()
 
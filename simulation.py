@@ -1,78 +1,137 @@
-import random
+import numpy as np
+
+try:
+    from numba import get_num_threads, njit, prange
+except ImportError: # Numba is optional; the NumPy fallback below is used instead
+    njit = None
+
+# Money is stored as integer cents and wage rates as integer basis points, so
+# balances are exact and the money supply is conserved from tick to tick.
+CENTS_PER_UNIT = 100
+BASIS_POINTS_PER_UNIT = 10000
+
+#======================================
+# TICK KERNELS
+#======================================
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True, nogil=True)
+    def _shopping_loop(hh_balance, hh_size, food_per_person, chosen, firm_price, firm_revenue, paid, n_chunks):
+        """Fused per-household shopping loop, parallelized over n_chunks."""
+        n_h = hh_balance.shape[0]
+        n_f = firm_price.shape[0]
+
+        # Households are split into one contiguous chunk per thread, and each
+        # chunk accumulates revenue into its own row so no atomics are needed.
+        chunk_size = (n_h + n_chunks - 1) // n_chunks
+        local_revenue = np.zeros((n_chunks, n_f), dtype=np.int64)
+
+        for c in prange(n_chunks):
+            for i in range(c * chunk_size, min(n_h, (c + 1) * chunk_size)):
+                j = chosen[i]
+                p = firm_price[j]
+                # Buy the desired amount, or as much as the balance covers
+                qty = min(hh_size[i] * food_per_person, hh_balance[i] // p)
+                amount = qty * p
+                hh_balance[i] -= amount
+                paid[i] = amount
+                local_revenue[c, j] += amount
+
+        for c in range(n_chunks):
+            for j in range(n_f):
+                firm_revenue[j] += local_revenue[c, j]
+
+    def _shopping_kernel(hh_balance, hh_size, food_per_person, chosen, firm_price, firm_revenue, paid):
+        """
+        Runs the shopping phase in a single fused pass over all households.
+        Updates hh_balance and firm_revenue in place and writes each
+        household's spend into paid. All money is in integer cents.
+        """
+        _shopping_loop(hh_balance, hh_size, food_per_person, chosen, firm_price,
+                       firm_revenue, paid, get_num_threads())
+else:
+    def _shopping_kernel(hh_balance, hh_size, food_per_person, chosen, firm_price, firm_revenue, paid):
+        """
+        Runs the shopping phase for all households using NumPy array ops.
+        Updates hh_balance and firm_revenue in place and writes each
+        household's spend into paid. All money is in integer cents.
+        """
+        price = firm_price[chosen]
+        # Buy the desired amount, or as much as the balance covers
+        qty = np.minimum(hh_size * food_per_person, hh_balance // price)
+        paid[:] = qty * price
+        hh_balance -= paid
+        np.add.at(firm_revenue, chosen, paid)
 
 #======================================
 # AGENT DEFINITIONS
 #======================================
+# Agent state lives in the Simulation's flat NumPy arrays (one array per
+# attribute, indexed by agent ID). The classes below are thin views over a
+# single row of those arrays, kept for callers that want per-agent access, and
+# convert money back to float units.
 
 class Household:
     """Represents a household that consumes goods and provides labor."""
-    def __init__(self, id, balance, size):
+    __slots__ = ('_sim', 'id')
+
+    def __init__(self, sim, id):
+        self._sim = sim
         self.id = id
-        self.balance = float(balance)
-        self.size = size
-        # self.labor_supply = 1 # Not used in MVP but good to keep in mind
-        self.employer_id = None # The ID of the firm that employs this household
+
+    @property
+    def balance(self):
+        return self._sim.hh_balance[self.id] / CENTS_PER_UNIT
+
+    @balance.setter
+    def balance(self, value):
+        self._sim.hh_balance[self.id] = round(value * CENTS_PER_UNIT)
+
+    @property
+    def size(self):
+        return int(self._sim.hh_size[self.id])
+
+    @property
+    def employer_id(self):
+        """The ID of the firm that employs this household."""
+        return int(self._sim.hh_employer[self.id])
 
     def determine_food_demand(self, food_per_person):
         """Calculates how much food the household wants to buy."""
         return self.size * food_per_person
 
-    def place_order_and_pay(self, price):
-        """
-        Calculates food demand, determines what can be afforded,
-        and returns the quantity purchased. Updates balance.
-        """
-        food_demand = self.determine_food_demand(food_per_person=1) # Using a default from your doc
-        cost = food_demand * price
-
-        if self.balance >= cost:
-            # Can afford the desired amount
-            purchased_quantity = food_demand
-            self.balance -= cost
-            return purchased_quantity
-        else:
-            # Cannot afford, buys as much as possible
-            purchased_quantity = int(self.balance / price) # floor division
-            self.balance -= purchased_quantity * price
-            return purchased_quantity
-
 class Firm:
     """Represents a firm that produces goods and employs households."""
-    def __init__(self, id, price, wage_rate):
-        self.id = id
-        self.balance = 0.0
-        self.price = float(price)
-        self.wage_rate = float(wage_rate)
-        self.worker_ids = [] # A list of household IDs
-        self.revenue_this_tick = 0.0
+    __slots__ = ('_sim', 'id')
 
-    def add_worker(self, household_id):
-        """Assigns a household to this firm."""
-        self.worker_ids.append(household_id)
+    def __init__(self, sim, id):
+        self._sim = sim
+        self.id = id
 
-    def receive_payment(self, amount):
-        """Collects money from sales."""
-        self.revenue_this_tick += amount
+    @property
+    def balance(self):
+        return self._sim.firm_balance[self.id] / CENTS_PER_UNIT
 
-    def pay_workers(self, households_dict):
-        """Pays wages to all its employees."""
-        # First, update balance with revenue from this tick's sales
-        self.balance += self.revenue_this_tick
-        self.revenue_this_tick = 0 # Reset for next tick
+    @balance.setter
+    def balance(self, value):
+        self._sim.firm_balance[self.id] = round(value * CENTS_PER_UNIT)
 
-        if not self.worker_ids:
-            return # No workers to pay
+    @property
+    def price(self):
+        return self._sim.firm_price[self.id] / CENTS_PER_UNIT
 
-        # Calculate the total amount to be paid as wages
-        total_payout = self.balance * self.wage_rate
-        wage_per_worker = total_payout / len(self.worker_ids)
+    @property
+    def wage_rate(self):
+        return self._sim.firm_wage[self.id] / BASIS_POINTS_PER_UNIT
 
-        # Distribute wages
-        for worker_id in self.worker_ids:
-            households_dict[worker_id].balance += wage_per_worker
+    @property
+    def revenue_this_tick(self):
+        return self._sim.firm_revenue[self.id] / CENTS_PER_UNIT
 
-        # Update the firm's balance after paying wages
-        self.balance -= total_payout
+    @property
+    def worker_ids(self):
+        """A list of the IDs of the households employed by this firm."""
+        return np.flatnonzero(self._sim.hh_employer == self.id).tolist()
 
 #======================================
 # SIMULATION ENGINE
@@ -80,57 +139,84 @@ class Firm:
 
 class Simulation:
     """Manages the overall simulation state and tick loop."""
-    def __init__(self, config):
+    def __init__(self, config, record_transactions=True):
         self.config = config
-        self.households = {} # Use a dictionary for easy lookup by ID
-        self.firms = {}      # Use a dictionary for easy lookup by ID
+        self.record_transactions = record_transactions # Set False when nothing consumes transactions
+        self.rng = np.random.default_rng(config.get('seed')) # Optional seed for reproducible runs
+        self.households = {} # Per-agent views, keyed by ID
+        self.firms = {}      # Per-agent views, keyed by ID
         self._setup_world()
 
     def _setup_world(self):
         """Initializes all households and firms based on the config file."""
-        # Create Firms
-        for i in range(self.config['N_F']):
-            self.firms[i] = Firm(id=i, price=self.config['p'], wage_rate=self.config['wage_rate'])
-
-        # Get a list of firm IDs to assign workers to
-        firm_ids = list(self.firms.keys())
-
-        # Create Households
-        initial_balance = self.config['M0'] / self.config['N_H']
-        for i in range(self.config['N_H']):
-            # Create the household
-            self.households[i] = Household(id=i, balance=initial_balance, size=self.config['household_size'])
-            
-            # Assign the household to a random firm
-            employer_firm_id = random.choice(firm_ids)
-            self.households[i].employer_id = employer_firm_id
-            self.firms[employer_firm_id].add_worker(i)
+        n_h = self.config['N_H']
+        n_f = self.config['N_F']
+
+        # Firm state (money in cents, wage rate in basis points)
+        self.firm_balance = np.zeros(n_f, dtype=np.int64)
+        self.firm_price = np.full(n_f, round(self.config['p'] * CENTS_PER_UNIT), dtype=np.int64)
+        self.firm_wage = np.full(n_f, round(self.config['wage_rate'] * BASIS_POINTS_PER_UNIT), dtype=np.int64)
+        self.firm_revenue = np.zeros(n_f, dtype=np.int64)
+
+        # Household state, each household assigned to a random firm. The
+        # initial money supply is split as evenly as whole cents allow.
+        m0_cents = round(self.config['M0'] * CENTS_PER_UNIT)
+        self.hh_balance = np.full(n_h, m0_cents // n_h, dtype=np.int64)
+        self.hh_balance[:m0_cents % n_h] += 1
+        self.hh_size = np.full(n_h, self.config['household_size'], dtype=np.int64)
+        self.hh_employer = self.rng.integers(0, n_f, n_h)
+
+        # Per-tick scratch and transaction output buffers, reused every tick
+        self._hh_ids = np.arange(n_h, dtype=np.int32)
+        self._paid = np.empty(n_h, dtype=np.int64)
+        self._bought = np.empty(n_h, dtype=np.bool_)
+        self._tx_from = np.empty(n_h, dtype=np.int32)
+        self._tx_to = np.empty(n_h, dtype=np.int32)
+        self._tx_amount = np.empty(n_h, dtype=np.int64)
+
+        self.firms = {i: Firm(self, i) for i in range(n_f)}
+        self.households = {i: Household(self, i) for i in range(n_h)}
 
     def run_one_tick(self):
         """
         Executes one full cycle of the simulation loop.
-        Returns a list of transactions that occurred.
+        Returns the transactions that occurred as three parallel arrays:
+        (from_ids, to_ids, amounts), with amounts in integer cents, or None
+        if record_transactions is off.
+
+        The returned arrays are views into buffers that are overwritten by
+        the next call, so callers must consume (or copy) them before then.
         """
-        firm_list = list(self.firms.values())
-        transactions_this_tick = []
+        n_h = len(self.hh_balance)
+        n_f = len(self.firm_price)
 
         # 1. Shopping Phase
-        for hh in self.households.values():
-            chosen_firm = random.choice(firm_list)
-            purchased_qty = hh.place_order_and_pay(price=chosen_firm.price)
-
-            if purchased_qty > 0:
-                # A transaction occurred, record it
-                amount = purchased_qty * chosen_firm.price
-                chosen_firm.receive_payment(amount)
-                transactions_this_tick.append({
-                    'from_id': hh.id,
-                    'to_id': chosen_firm.id,
-                    'amount': amount
-                })
+        # Every household picks a random firm and buys as much of its desired
+        # food as it can afford.
+        chosen = self.rng.integers(0, n_f, n_h)
+        paid = self._paid
+        _shopping_kernel(self.hh_balance, self.hh_size, self.config['food_per_person'],
+                         chosen, self.firm_price, self.firm_revenue, paid)
+
+        # Record transactions as parallel arrays: household -> firm, amount
+        transactions = None
+        if self.record_transactions:
+            bought = np.greater(paid, 0, out=self._bought)
+            k = int(np.count_nonzero(bought))
+            transactions = (np.compress(bought, self._hh_ids, out=self._tx_from[:k]),
+                            np.compress(bought, chosen, out=self._tx_to[:k]),
+                            np.compress(bought, paid, out=self._tx_amount[:k]))
 
         # 2. Payday Phase
-        for f in self.firms.values():
-            f.pay_workers(self.households)
-            
-        return transactions_this_tick
\ No newline at end of file
+        # Each firm banks this tick's revenue, then splits a fixed share of its
+        # balance equally among its workers. Cents that don't divide evenly
+        # stay with the firm.
+        self.firm_balance += self.firm_revenue
+        self.firm_revenue[:] = 0
+        workers_per_firm = np.bincount(self.hh_employer, minlength=n_f)
+        payout = self.firm_balance * self.firm_wage // BASIS_POINTS_PER_UNIT
+        wage_per_worker = payout // np.maximum(workers_per_firm, 1)
+        self.hh_balance += wage_per_worker[self.hh_employer]
+        self.firm_balance -= wage_per_worker * workers_per_firm
+
+        return transactions